@@ -1,7 +1,72 @@
+import logging
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
 
 from app.settings import settings
 from .schemas import UserInDB
+from .utils.metrics import PoolListener
+
+logger = logging.getLogger(__name__)
 
-client = AsyncIOMotorClient(settings.mongo_uri, uuidRepresentation="standard")
+client = AsyncIOMotorClient(settings.mongo_uri, uuidRepresentation="standard", event_listeners=[PoolListener()])
 db = client["db_prod0ucti0on00"]
+
+# (collection, keys, options) — unique indexes let write handlers insert or
+# update directly and catch DuplicateKeyError instead of checking first.
+INDEXES = [
+    ("company", [("id", ASCENDING)], {"unique": True}),
+    ("company", [("name", ASCENDING)], {"unique": True}),
+    ("company", [("email", ASCENDING)], {"unique": True}),
+    # фильтры каталога компаний
+    ("company", [("sphere", ASCENDING), ("status", ASCENDING), ("investment_required", ASCENDING)], {}),
+    ("company", [("sphere", ASCENDING), ("status", ASCENDING), ("total_revenue", ASCENDING)], {}),
+    ("company", [("typeOrg", ASCENDING), ("status", ASCENDING)], {}),
+    ("company", [("investment_round", ASCENDING), ("investment_required", ASCENDING)], {}),
+    ("company", [("type_of_registration", ASCENDING), ("status", ASCENDING)], {}),
+    ("users", [("id", ASCENDING)], {"unique": True}),
+    ("users", [("NationalID", ASCENDING)], {"unique": True}),
+    ("users", [("company_id", ASCENDING)], {}),
+    ("post", [("id", ASCENDING)], {"unique": True}),
+    ("post", [("company_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("post", [("sender_id", ASCENDING)], {}),
+    ("post", [("updated_at", ASCENDING)], {}),
+    ("review", [("id", ASCENDING)], {"unique": True}),
+    ("review", [("company_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("review", [("reviewer_id", ASCENDING)], {}),
+    ("review", [("updated_at", ASCENDING)], {}),
+    ("message", [("room_id", ASCENDING), ("id", ASCENDING)], {"unique": True}),
+    ("message", [("room_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("message", [("room_id", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ("message_buckets", [("room_id", ASCENDING), ("end", DESCENDING)], {}),
+    # один открытый бакет на комнату и окно
+    ("message_buckets", [("room_id", ASCENDING), ("window", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"open": True}}),
+    ("message_buckets", [("room_id", ASCENDING), ("messages.id", ASCENDING)], {}),
+    ("message_buckets", [("room_id", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ("message_rooms", [("id", ASCENDING)], {"unique": True}),
+    ("message_rooms", [("participants", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ("tombstones", [("deleted_at", ASCENDING)], {"expireAfterSeconds": settings.tombstone_ttl_days * 86400}),
+    ("tombstones", [("kind", ASCENDING), ("deleted_at", ASCENDING)], {}),
+    ("cleanup_jobs", [("id", ASCENDING)], {"unique": True}),
+    ("cleanup_jobs", [("status", ASCENDING)], {}),
+    ("tasks", [("id", ASCENDING)], {"unique": True}),
+    ("tasks", [("status", ASCENDING), ("run_at", ASCENDING)], {}),
+    ("tasks", [("status", ASCENDING), ("locked_at", ASCENDING)], {}),
+    # выполненные задачи удаляются сами, упавшие остаются для /tasks/{id}/retry
+    ("tasks", [("finished_at", ASCENDING)], {"expireAfterSeconds": settings.task_done_ttl_days * 86400}),
+]
+
+
+async def ensure_indexes():
+    for collection, keys, options in INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            # write handlers rely on unique indexes instead of checking first —
+            # without one duplicates would be inserted silently
+            if options.get("unique"):
+                logger.error("Could not create unique index %s on %s: %s", keys, collection, e)
+                raise
+            logger.warning("Could not create index %s on %s: %s", keys, collection, e)
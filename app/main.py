@@ -1,9 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
+import asyncio
 import os
 
 from .routers import *
+from .db import ensure_indexes
+from .utils.tasks import start_workers, stop_workers
+from .utils.autocomplete import load_indexes, reconcile_indexes
+from .utils.metrics import MetricsMiddleware, render as render_metrics, sample_loop_lag
+from .utils.profiler import ProfilerMiddleware
+from .utils.auth import is_admin_token
+from .settings import settings
 
 app = FastAPI()
 
@@ -14,9 +23,11 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilerMiddleware, is_admin=is_admin_token, interval=settings.profile_request_interval)
 
 
-for r in [companies, users, posts, messages, reviews, auth]:
+for r in [companies, users, posts, messages, reviews, auth, cleanup, tasks, sync, debug]:
     app.include_router(r)
 
 app_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,6 +35,24 @@ static_path = os.path.join(app_dir, "..", "static")
 
 app.mount("/static", StaticFiles(directory=static_path), name="static")
 
+@app.on_event("startup")
+async def startup():
+    await ensure_indexes()
+    await start_workers()
+    await load_indexes()
+    app.state.reconcile = asyncio.create_task(reconcile_indexes())
+    app.state.loop_lag = asyncio.create_task(sample_loop_lag(settings.metrics_loop_interval))
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.reconcile.cancel()
+    app.state.loop_lag.cancel()
+    await stop_workers()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(await render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Enterra API"}
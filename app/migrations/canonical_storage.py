@@ -0,0 +1,118 @@
+"""
+Приведение старых документов к единому формату: id — бинарные UUID, даты — BSON datetime.
+
+    python -m app.migrations.canonical_storage [--batch-size 500] [--pause 0.1] [--restart] [collection ...]
+
+Коллекция проходится по _id, последний обработанный _id сохраняется в
+db.migrations, поэтому миграцию можно прерывать и запускать повторно — она
+продолжит с места остановки. --restart сбрасывает сохранённые позиции.
+
+Миграция должна закончиться до того, как новая версия начнёт принимать
+запросы: поиск по id больше не проверяет строковую форму, и документы со
+строковыми id не найдутся.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from ..db import db
+from ..utils.codec import UUID_FIELDS, DATETIME_FIELDS, encode
+
+# коллекция -> префиксы вложенных документов, где тоже лежат id и даты
+COLLECTIONS = {
+    "company": [""],
+    "users": [""],
+    "post": [""],
+    "review": [""],
+    "message": [""],
+    "message_buckets": ["", "messages."],
+    "message_rooms": [""],
+    "cleanup_jobs": [""],
+    "tasks": ["", "payload."],
+}
+
+# _id из insert_one и строковые _id бакетов из миграции message_buckets;
+# $gt сравнивает только значения одного типа, поэтому диапазоны идут по очереди
+ID_TYPES = ("objectId", "string")
+
+
+def _legacy_query(prefixes: list[str]) -> dict:
+    fields = sorted(UUID_FIELDS | DATETIME_FIELDS)
+    return {"$or": [{p + f: {"$type": "string"}} for p in prefixes for f in fields]}
+
+
+async def migrate_collection(name: str, batch_size: int, pause: float) -> int:
+    converted = 0
+    for id_type in ID_TYPES:
+        converted += await _migrate_range(name, id_type, batch_size, pause)
+    return converted
+
+
+async def _migrate_range(name: str, id_type: str, batch_size: int, pause: float) -> int:
+    coll = db[name]
+    query = _legacy_query(COLLECTIONS[name])
+    key = f"canonical_storage:{name}:{id_type}"
+    checkpoint = await db.migrations.find_one({"_id": key}) or {}
+    if checkpoint.get("done"):
+        return 0
+    last_id, converted = checkpoint.get("last_id"), checkpoint.get("converted", 0)
+
+    # идём по _id: каждая пачка — продолжение диапазона по индексу _id,
+    # а не повторный поиск по всей коллекции
+    while True:
+        id_query = {"$type": id_type}
+        if last_id is not None:
+            id_query["$gt"] = last_id
+        docs = await coll.find({**query, "_id": id_query}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            try:
+                canonical = encode(doc)
+            except ValueError as e:
+                print(f"{name} {doc['_id']}: skipped, {e}")
+                continue
+            changed = {k: v for k, v in canonical.items() if k != "_id" and v != doc[k]}
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changed}))
+
+        if ops:
+            await coll.bulk_write(ops, ordered=False)
+            converted += len(ops)
+            print(f"{name}: {converted} converted")
+        last_id = docs[-1]["_id"]
+        await _save_checkpoint(key, last_id=last_id, converted=converted)
+        await asyncio.sleep(pause)
+
+    await _save_checkpoint(key, done=True)
+    return converted
+
+
+async def _save_checkpoint(key: str, **fields):
+    await db.migrations.update_one(
+        {"_id": key},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("collections", nargs="*", default=list(COLLECTIONS))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints")
+    args = parser.parse_args()
+
+    for name in args.collections:
+        if args.restart:
+            await db.migrations.delete_many({"_id": {"$regex": f"^canonical_storage:{name}:"}})
+        total = await migrate_collection(name, args.batch_size, args.pause)
+        print(f"{name}: done, {total} documents converted")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Перенос сообщений из db.message в бакеты db.message_buckets.
+
+    python -m app.migrations.message_buckets
+
+Запускать до переключения MESSAGE_STORAGE=buckets. Миграцию можно прервать
+и запустить снова: бакет записывается под детерминированным _id, а исходные
+документы удаляются только после записи их бакета.
+"""
+import asyncio
+
+from ..db import db
+from ..settings import settings
+from ..utils.message_store import window_start
+
+
+async def _flush(room_id, chunk: list[dict]):
+    await db.message_buckets.replace_one(
+        {"_id": f"{room_id}:{chunk[0]['id']}"},
+        {
+            "room_id": room_id,
+            "window": window_start(chunk[0]["timestamp"], settings.message_bucket_window_minutes),
+            "count": len(chunk),
+            "start": chunk[0]["timestamp"],
+            "end": chunk[-1]["timestamp"],
+            "updated_at": max(m.get("updated_at", m["timestamp"]) for m in chunk),
+            "messages": chunk,
+        },
+        upsert=True,
+    )
+    await db.message.delete_many({"room_id": room_id, "id": {"$in": [m["id"] for m in chunk]}})
+
+
+async def migrate_room(room_id) -> int:
+    size = settings.message_bucket_size
+    minutes = settings.message_bucket_window_minutes
+
+    cursor = db.message.find({"room_id": room_id}, {"_id": 0, "room_id": 0}).sort("timestamp", 1)
+    chunk, moved = [], 0
+    async for message in cursor:
+        if chunk and (
+            len(chunk) >= size
+            or window_start(message["timestamp"], minutes) != window_start(chunk[0]["timestamp"], minutes)
+        ):
+            await _flush(room_id, chunk)
+            moved += len(chunk)
+            chunk = []
+        chunk.append(message)
+
+    if chunk:
+        await _flush(room_id, chunk)
+        moved += len(chunk)
+    return moved
+
+
+async def migrate_all():
+    room_ids = await db.message.distinct("room_id")
+    for i, room_id in enumerate(room_ids, 1):
+        moved = await migrate_room(room_id)
+        print(f"[{i}/{len(room_ids)}] room {room_id}: {moved} messages")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate_all())
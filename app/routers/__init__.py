@@ -5,6 +5,10 @@ from .posts import router as posts
 from .messages import router as messages
 from .reviews import router as reviews
 from .auth import router as auth
+from .cleanup import router as cleanup
+from .tasks import router as tasks
+from .sync import router as sync
+from .debug import router as debug
 
 __all__ = [
     "companies",
@@ -12,5 +16,9 @@ __all__ = [
     "posts",
     "messages",
     "reviews",
-    "auth"
+    "auth",
+    "cleanup",
+    "tasks",
+    "sync",
+    "debug"
 ]
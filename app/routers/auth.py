@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
-from uuid import UUID, uuid4
+from uuid import UUID
 from typing import Optional
 from datetime import datetime
+import asyncio
+from pymongo.errors import DuplicateKeyError
 
 from .users import login as user_login
 from ..utils.auth import get_user_by_NationalID, get_companies, create_access_token, get_current_user, hash_password
 from ..db import db
 from ..models import TokenResponse
 from ..schemas import UserOut
-from ..utils.helpers import save_img
+from ..utils.helpers import store_img, remove_img
+from ..utils.autocomplete import user_names
+from ..utils.ids import new_id
+from ..utils.codec import encode
 
 
 router = APIRouter( tags=["auth"])
@@ -33,28 +38,30 @@ async def register(
     password: str = Form(...),
     avatar: Optional[UploadFile] = File(None)
 ):
-    if await get_user_by_NationalID(NationalID):
+    # Обе проверки независимы — выполняем их одновременно
+    existing, company = await asyncio.gather(
+        get_user_by_NationalID(NationalID),
+        db.company.find_one({"id": company_id}, {"_id": 1}),
+    )
+
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="NatinalID already registered"
         )
-    
-    doc = await db.company.find_one({"id": str(company_id)})
 
-    if doc is None:
+    if company is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Company not found"
         )
-    
-    doc = await db.users.find_one({"company_id": str(company_id), "NationalID": NationalID})
-    if doc:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this NationalID already exists in this company"
-        )
-    
-    id = uuid4()
+
+    id = new_id()
+    # bcrypt и запись аватара блокируют — в потоках и одновременно
+    password_hash, avatar_path = await asyncio.gather(
+        asyncio.to_thread(hash_password, password),
+        store_img('avatar', avatar),
+    )
 
     user_dict = {
         "id": id,
@@ -62,13 +69,23 @@ async def register(
         "fullname": fullname,
         "NationalID": NationalID,
         "position": position,
-        "password": hash_password(password),
-        "created_at": datetime.utcnow().isoformat(),
+        "password": password_hash,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
     }
 
-    user_dict["avatar"] = save_img('avatar', avatar) if avatar else None
+    user_dict["avatar"] = avatar_path
 
-    await db.users.insert_one(user_dict)
+    # Гонку между проверкой и вставкой закрывает уникальный индекс по NationalID
+    try:
+        await db.users.insert_one(encode(user_dict))
+    except DuplicateKeyError:
+        remove_img(user_dict["avatar"])
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="NatinalID already registered"
+        )
+    user_names.add(id, fullname)
     return UserOut(**user_dict)
 
 @router.get("/protected", response_model=UserOut)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException, Depends
+from uuid import UUID
+
+from ..utils.auth import get_admin_user
+from ..db import db
+
+router = APIRouter(prefix="/cleanup", tags=["cleanup"], dependencies=[Depends(get_admin_user)])
+
+@router.get("/{job_id}")
+async def read_cleanup_job(job_id: UUID):
+    doc = await db.cleanup_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(404, "Cleanup job not found")
+    return doc
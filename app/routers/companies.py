@@ -1,19 +1,68 @@
 from fastapi import APIRouter, HTTPException, Form, File, UploadFile, Depends, Query
 from typing import List
 from pydantic import EmailStr
-from uuid import UUID, uuid4
+from uuid import UUID
 from typing import Optional
 import shutil
+import asyncio
+import json
 import os
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from ..schemas import CompanyOut, CompanyCreate, CompanyInDB, CompanyUpdate
+from ..schemas import CompanyOut, CompanyCreate, CompanyInDB, CompanyUpdate, CompanySuggestion, CompanyFacets
+from ..schemas import CompanyDashboard, UserOut, PostOut, ReviewOut
 from ..utils.auth import hash_password, get_current_user
 from ..db import db
-from ..utils.helpers import save_img
+from ..utils.helpers import store_img, remove_img
+from ..utils.cleanup import enqueue_cleanup
+from ..utils.tasks import task, enqueue
+from ..utils.autocomplete import company_names
+from ..utils.cache import TTLCache
+from ..settings import settings
+from ..utils.singleflight import coalesce
+from ..utils.ids import new_id
+from ..utils.codec import encode
+from ..utils.tombstones import record_deleted
+from datetime import datetime
 
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
+FACET_FIELDS = ["sphere", "status", "typeOrg", "investment_round", "type_of_registration"]
+RANGE_FIELDS = ["investment_required", "total_revenue"]
+
+facet_cache = TTLCache(settings.facet_cache_seconds)
+dashboard_cache = TTLCache(settings.dashboard_cache_seconds)
+
+def company_filters(
+    sphere: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    type_org: Optional[List[str]] = Query(None),
+    investment_round: Optional[List[str]] = Query(None),
+    type_of_registration: Optional[List[str]] = Query(None),
+    min_investment_required: Optional[float] = None,
+    max_investment_required: Optional[float] = None,
+    min_total_revenue: Optional[float] = None,
+    max_total_revenue: Optional[float] = None,
+) -> dict:
+    query = {}
+    values = [sphere, status, type_org, investment_round, type_of_registration]
+    for field, value in zip(FACET_FIELDS, values):
+        if value:
+            query[field] = value[0] if len(value) == 1 else {"$in": value}
+
+    bounds = [(min_investment_required, max_investment_required), (min_total_revenue, max_total_revenue)]
+    for field, (low, high) in zip(RANGE_FIELDS, bounds):
+        cond = {}
+        if low is not None:
+            cond["$gte"] = low
+        if high is not None:
+            cond["$lte"] = high
+        if cond:
+            query[field] = cond
+    return query
+
 @router.post("/", response_model=CompanyOut)
 async def create_company(
     name: str = Form(...),
@@ -39,13 +88,8 @@ async def create_company(
     total_revenue: Optional[float] = Form(None),
     logo: Optional[UploadFile] = File(None),
 ):
-    # Проверка на уникальность по имени или email
-    existing = await db.company.find_one({"$or": [{"name": name}, {"email": email}]})
-    if existing:
-        raise HTTPException(400, "Company with this name or email already exists")
-
     data = {
-        "id": str(uuid4()),
+        "id": new_id(),
         "name": name,
         "email": email,
         "sphere": sphere,
@@ -67,30 +111,125 @@ async def create_company(
         "CAC": CAC,
         "LTV": LTV,
         "total_revenue": total_revenue,
-        "logo": save_img("logo", logo) if logo else None,
+        "logo": await store_img("logo", logo),
+        "updated_at": datetime.utcnow(),
     }
     try :
         CompanyInDB(**data)
     except Exception as e :
+        remove_img(data["logo"])
         raise HTTPException(400, f"Invalid data: {e}")
-    
 
-    await db.company.insert_one(data)
+    # Уникальность по имени и email гарантируют индексы
+    try:
+        await db.company.insert_one(encode(data))
+    except DuplicateKeyError:
+        remove_img(data["logo"])
+        raise HTTPException(400, "Company with this name or email already exists")
+    company_names.add(data["id"], name)
     return CompanyInDB(**data)
 
 @router.get("/", response_model=list[CompanyOut])
-async def list_companies():
-    docs = db.company.find({}, {"_id":0, "password":0})
+async def list_companies(
+    query: dict = Depends(company_filters),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=200)
+):
+    docs = db.company.find(query, {"_id":0, "password":0}).sort("name", 1).skip(skip)
+    if limit:
+        docs = docs.limit(limit)
     return [CompanyOut(**doc) async for doc in docs]
 
+@router.get("/facets", response_model=CompanyFacets)
+async def company_facets(query: dict = Depends(company_filters)):
+    key = json.dumps(query, sort_keys=True)
+    cached = facet_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # счётчики по полю считаются без фильтра по самому этому полю,
+    # чтобы было видно, сколько даст выбор другого значения
+    ranges = {k: v for k, v in query.items() if k in RANGE_FIELDS}
+    values = {k: v for k, v in query.items() if k in FACET_FIELDS}
+    facets = {"total": [{"$match": values}, {"$count": "n"}]}
+    for field in FACET_FIELDS:
+        facets[field] = [
+            {"$match": {k: v for k, v in values.items() if k != field}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ]
+
+    docs = await db.company.aggregate([{"$match": ranges}, {"$facet": facets}]).to_list(1)
+    doc = docs[0]
+    result = CompanyFacets(
+        total=doc["total"][0]["n"] if doc["total"] else 0,
+        facets={
+            field: [{"value": b["_id"], "count": b["count"]} for b in doc[field]]
+            for field in FACET_FIELDS
+        },
+    )
+    facet_cache.set(key, result)
+    return result
+
+@router.get("/autocomplete", response_model=list[CompanySuggestion])
+async def autocomplete_companies(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    return [CompanySuggestion(id=id, name=name) for id, name in company_names.search(q, limit)]
+
 @router.get("/id/{company_id}", response_model=CompanyOut)
+@coalesce
 async def read_company(company_id: UUID):
-    doc = await db.company.find_one({"id": str(company_id)})
+    doc = await db.company.find_one({"id": company_id})
     if not doc:
         raise HTTPException(404, "Company not found")
     return CompanyOut(**doc)
 
+@router.get("/id/{company_id}/dashboard", response_model=CompanyDashboard, dependencies=[Depends(get_current_user)])
+async def read_company_dashboard(
+    company_id: UUID,
+    employees_limit: int = Query(10, ge=1, le=50),
+    posts_limit: int = Query(10, ge=1, le=50),
+    reviews_limit: int = Query(5, ge=1, le=50)
+):
+    key = (company_id, employees_limit, posts_limit, reviews_limit)
+    cached = dashboard_cache.get(key) if settings.dashboard_cache_seconds else None
+    if cached is not None:
+        return cached
+
+    result = await build_company_dashboard(company_id, employees_limit, posts_limit, reviews_limit)
+    if settings.dashboard_cache_seconds:
+        dashboard_cache.set(key, result)
+    return result
+
+@coalesce
+async def build_company_dashboard(company_id: UUID, employees_limit: int, posts_limit: int, reviews_limit: int):
+    # все секции независимы — запрашиваем их одновременно
+    by_company = {"company_id": company_id}
+    company, employees_total, employees, posts, rating, reviews = await asyncio.gather(
+        db.company.find_one({"id": company_id}, {"_id": 0}),
+        db.users.count_documents(by_company),
+        db.users.find(by_company, {"_id": 0, "password": 0}).limit(employees_limit).to_list(employees_limit),
+        db.post.find(by_company, {"_id": 0}).sort("timestamp", -1).limit(posts_limit).to_list(posts_limit),
+        db.review.aggregate([
+            {"$match": by_company},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "avg": {"$avg": "$rating"}}},
+        ]).to_list(1),
+        db.review.find(by_company, {"_id": 0}).sort("timestamp", -1).limit(reviews_limit).to_list(reviews_limit),
+    )
+    if not company:
+        raise HTTPException(404, "Company not found")
+
+    return CompanyDashboard(
+        company=CompanyOut(**company),
+        employees_total=employees_total,
+        employees=[UserOut(**doc) for doc in employees],
+        posts=[PostOut(**doc) for doc in posts],
+        reviews_total=rating[0]["count"] if rating else 0,
+        rating=rating[0]["avg"] if rating else None,
+        reviews=[ReviewOut(**doc) for doc in reviews],
+    )
+
 @router.get("/name/{name}", response_model=CompanyOut)
+@coalesce
 async def read_company_by_name(name: str):
     doc = await db.company.find_one({"name": name})
     if not doc:
@@ -104,18 +243,49 @@ async def update_company(company_id: UUID, payload: CompanyUpdate):
     if "password" in data:
         data["password"] = hash_password(data["password"])
 
-    res = await db.company.update_one({"id": str(company_id)}, {"$set": data})
-    if res.matched_count == 0:
+    if not data:
+        return await read_company(company_id)
+
+    try:
+        doc = await db.company.find_one_and_update(
+            {"id": company_id},
+            {"$set": encode({**data, "updated_at": datetime.utcnow()})},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(400, "Company with this name or email already exists")
+    if not doc:
         raise HTTPException(404, "Company not found")
 
-    return await read_company(company_id)
+    if "name" in data:
+        company_names.add(company_id, data["name"])
+        await enqueue("company.rename", {"company_id": company_id})
+    return CompanyOut(**doc)
+
+@task("company.rename")
+async def propagate_company_name(company_id: UUID, name: str | None = None):
+    # название компании продублировано в постах; берём текущее из базы, а не из
+    # payload (name — от задач, поставленных до этого), чтобы параллельные
+    # переименования и повторы сходились на последнем названии
+    company = await db.company.find_one({"id": company_id}, {"name": 1})
+    if not company:
+        return
+    await db.post.update_many(
+        {"company_id": company_id, "company_name": {"$ne": company["name"]}},
+        {"$set": {"company_name": company["name"], "updated_at": datetime.utcnow()}}
+    )
 
 @router.delete("/{company_id}")
 async def delete_company(company_id: UUID):
-    res = await db.company.delete_one({"id": str(company_id)})
-    if res.deleted_count == 0:
+    doc = await db.company.find_one_and_delete({"id": company_id}, {"logo": 1})
+    if not doc:
         raise HTTPException(404, "Company not found")
-    return {"detail": "Deleted"}
+    company_names.remove(company_id)
+    await record_deleted("company", [company_id])
+    # сотрудники, посты, отзывы и файлы удаляются в фоне
+    job_id = await enqueue_cleanup("company", company_id, [doc.get("logo")])
+    return {"detail": "Deleted", "cleanup_job_id": job_id}
 
 @router.get("/search/", response_model=List[CompanyOut])
 async def search_users_by_name(part: str = Query(..., min_length=1)):
@@ -0,0 +1,46 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse, JSONResponse
+
+from ..utils.auth import get_admin_user
+from ..utils.profiler import SamplingProfiler, recent_profiles
+from ..settings import settings
+
+router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(get_admin_user)])
+
+FORMATS = "^(collapsed|speedscope)$"
+
+# одновременно — только один профиль всего процесса
+_profile_lock = asyncio.Lock()
+
+def _render(profiler: SamplingProfiler, format: str):
+    if format == "speedscope":
+        return JSONResponse(profiler.speedscope())
+    return PlainTextResponse(profiler.collapsed())
+
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: str = Query("collapsed", pattern=FORMATS),
+    all_threads: bool = False,
+):
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(400, f"seconds must be <= {settings.profile_max_seconds}")
+    if _profile_lock.locked():
+        raise HTTPException(409, "Profiling already in progress")
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval_ms / 1000, all_threads=all_threads, name=f"worker {seconds}s")
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    return _render(profiler, format)
+
+@router.get("/profile/{profile_id}")
+async def read_profile(profile_id: str, format: str = Query("collapsed", pattern=FORMATS)):
+    profiler = recent_profiles.get(profile_id)
+    if profiler is None:
+        raise HTTPException(404, "Profile not found")
+    return _render(profiler, format)
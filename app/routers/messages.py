@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Form, HTTPException, Depends, UploadFile, File
-from uuid import UUID, uuid4
+from fastapi import APIRouter, Form, HTTPException, Depends, UploadFile, File, Query
+from uuid import UUID
 from datetime import datetime
+from typing import Optional
 
 from ..schemas import MessageOut, MessageCreate, UserInDB, MessageUpdate, MessageRoomCreate, MessageRoomOut
 from ..utils.auth import get_current_user
 from ..db import db
-from ..utils.helpers import save_img
+from ..utils.helpers import store_img
+from ..utils.message_store import message_store
+from ..utils.ids import new_id
+from ..utils.codec import encode, to_datetime
+from ..utils.tombstones import record_deleted
 
 router = APIRouter(prefix="/messages", tags=["messages"], dependencies=[Depends(get_current_user)])
 
@@ -15,7 +20,7 @@ async def create_message_room(
     user: UserInDB = Depends(get_current_user)
 ):
     data = payload.model_dump()
-    data["created_at"] = datetime.utcnow()
+    data["created_at"] = data["updated_at"] = datetime.utcnow()
 
     # Добавим текущего пользователя (автора) в список участников
     if user.id not in data["participants"]:
@@ -23,8 +28,8 @@ async def create_message_room(
 
     # --- Групповой чат ---
     if data["is_group"]:
-        data["id"] = uuid4()
-        await db.message_rooms.insert_one(data)
+        data["id"] = new_id()
+        await db.message_rooms.insert_one(encode(data))
         return MessageRoomOut(**data)
 
     # --- Персональный чат (должен быть уникальным по участникам) ---
@@ -32,7 +37,7 @@ async def create_message_room(
         raise HTTPException(status_code=400, detail="Private chat must have exactly two participants.")
 
     # Сортируем участников для гарантии одинакового порядка
-    sorted_participants = sorted(str(uid) for uid in data["participants"])
+    sorted_participants = sorted(data["participants"], key=str)
     
     # Ищем уже существующий персональный чат с теми же участниками
     existing = await db.message_rooms.find_one({
@@ -43,9 +48,9 @@ async def create_message_room(
     if existing:
         return MessageRoomOut(**existing)
 
-    data["id"] = uuid4()
+    data["id"] = new_id()
     data["participants"] = sorted_participants  # сохраняем в отсортированном виде
-    await db.message_rooms.insert_one(data)
+    await db.message_rooms.insert_one(encode(data))
     return MessageRoomOut(**data)
 
 
@@ -59,64 +64,55 @@ async def create_message(
     data = {}
 
     data.update({
-        "id": uuid4(),
-        "room_id": message_room_id,
+        "id": new_id(),
         "sender_id": user.id,
         "content": content,
-        "image": image.filename if image else None,
+        "image": await store_img('message', image),
         "timestamp": datetime.utcnow(),
-        "status": "loading", 
-        "image": save_img('message', image) if image else None
+        "status": "loading",
     })
+    data["updated_at"] = data["timestamp"]
 
-    await db.message.insert_one(data)
+    await message_store.append(message_room_id, data)
     return MessageOut(**data)
 
 @router.get("/{message_room_id}", response_model=list[MessageOut])
-async def list_messages(message_room_id: UUID):
-    docs = db.message.find({"room_id": message_room_id}, {"_id": 0})
-    return [MessageOut(**doc) async for doc in docs]
+async def list_messages(
+    message_room_id: UUID,
+    before: Optional[datetime] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
+    # в базе naive UTC — "...Z" или смещение в запросе иначе не сравнить
+    if before:
+        before = to_datetime(before)
+    docs = await message_store.list(message_room_id, before, limit)
+    return [MessageOut(**doc) for doc in docs]
 
 @router.get("/{message_room_id}/last", response_model=MessageOut)
 async def get_last_message(message_room_id: UUID):
-    doc = await db.message.find_one(
-        {"room_id": message_room_id},
-        sort=[("created_at", -1)],
-        projection={"_id": 0}
-    )
+    doc = await message_store.last(message_room_id)
     if not doc:
         raise HTTPException(status_code=404, detail="No messages found in this room")
     return MessageOut(**doc)
 
 @router.get("/", response_model=list[MessageRoomOut])
 async def list_message_rooms(user: UserInDB = Depends(get_current_user)):
-    docs = db.message_rooms.find({"participants": str(user.id)}, {"_id": 0})
+    docs = db.message_rooms.find({"participants": user.id}, {"_id": 0})
     return [MessageRoomOut(**doc) async for doc in docs]
 
 @router.get("/{message_room_id}/{message_id}", response_model=MessageOut)
 async def read_message(message_room_id: UUID, message_id: UUID):
-    doc = await db.message.find_one({"id": message_id, "room_id": message_room_id}, {"_id": 0})
+    doc = await message_store.get(message_room_id, message_id)
     if not doc:
         raise HTTPException(404, "Message not found")
     return MessageOut(**doc)
 
 @router.put("/{message_room_id}/{message_id}/read", response_model=MessageOut)
 async def mark_message_as_read(message_room_id: UUID, message_id: UUID):
-    res = await db.message.update_one(
-        {"id": message_id, "room_id": message_room_id},
-        {"$set": {"status": 'read'}}
-    )
-
-    if res.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Message not found")
-
-    message = await db.message.find_one(
-        {"id": message_id, "room_id": message_room_id},
-        {"_id": 0}
-    )
+    message = await message_store.update(message_room_id, message_id, {"status": 'read'})
 
     if not message:
-        raise HTTPException(status_code=404, detail="Message not found after update")
+        raise HTTPException(status_code=404, detail="Message not found")
 
     return MessageOut(**message)
 
@@ -124,18 +120,17 @@ async def mark_message_as_read(message_room_id: UUID, message_id: UUID):
 @router.put("/{message_room_id}/{message_id}", response_model=MessageOut)
 async def update_message(message_room_id: UUID, message_id: UUID, payload: MessageUpdate):
     data = payload.model_dump(exclude_unset=True)
-    res = await db.message.update_one(
-        {"id": message_id, "room_id": message_room_id},
-        {"$set": data}
-    )
-    if res.matched_count == 0:
+    if not data:
+        return await read_message(message_room_id, message_id)
+    doc = await message_store.update(message_room_id, message_id, data)
+    if not doc:
         raise HTTPException(404, "Message not found")
-    return await read_message(message_room_id, message_id)
+    return MessageOut(**doc)
 
 @router.delete("/{message_room_id}/{message_id}")
 async def delete_message(message_room_id: UUID, message_id: UUID):
-    res = await db.message.delete_one({"id": message_id, "room_id": message_room_id})
-    if res.deleted_count == 0:
+    if not await message_store.delete(message_room_id, message_id):
         raise HTTPException(404, "Message not found")
+    await record_deleted("message", [message_id], room_id=message_room_id)
     return {"detail": "Deleted"}
 
@@ -1,14 +1,20 @@
+import asyncio
 from datetime import datetime
 from fastapi import APIRouter, Form, HTTPException, Depends, UploadFile, File, Query
 from typing import List, Optional
-from uuid import UUID, uuid4
+from uuid import UUID
 import shutil
 import os
+from pymongo import ReturnDocument
 
 from ..schemas import PostOut, PostCreate, PostInDB, PostUpdate, UserInDB
 from ..utils.auth import get_current_user
-from ..utils.helpers import get_company_name, save_img
+from ..utils.helpers import get_company_name, store_img
 from ..db import db
+from ..utils.singleflight import coalesce
+from ..utils.ids import new_id
+from ..utils.codec import encode
+from ..utils.tombstones import record_deleted
 
 
 router = APIRouter(prefix="/company/posts", tags=["posts"], dependencies=[Depends(get_current_user)])
@@ -19,9 +25,11 @@ async def create_post(
     image: UploadFile = File(None),
     user: UserInDB = Depends(get_current_user)
 ):
-    post_id = uuid4()
-    image_path = save_img("post_image", image) if image else None
-    company_name = await get_company_name(user.company_id)
+    post_id = new_id()
+    image_path, company_name = await asyncio.gather(
+        store_img("post_image", image),
+        get_company_name(user.company_id),
+    )
 
     post_data = {
         "id": post_id,
@@ -34,8 +42,9 @@ async def create_post(
         "timestamp": datetime.utcnow(),
         "likes": 0
     }
+    post_data["updated_at"] = post_data["timestamp"]
 
-    await db.post.insert_one(post_data)
+    await db.post.insert_one(encode(post_data))
     return PostOut(**post_data)
 
 @router.get("/", response_model=list[PostOut])
@@ -44,12 +53,14 @@ async def list_posts():
     return [PostOut(**doc) async for doc in docs]
 
 @router.get("/{company_id}", response_model=list[PostOut])
+@coalesce
 async def list_posts(company_id: UUID):
     docs = db.post.find({"company_id": company_id}, {"_id":0})
     return [PostOut(**doc) async for doc in docs]
 
 
 @router.get("/{post_id}", response_model=PostOut)
+@coalesce
 async def read_post(post_id: UUID):
     doc = await db.post.find_one({"id": post_id}, {"_id":0})
     if not doc:
@@ -59,42 +70,46 @@ async def read_post(post_id: UUID):
 @router.put("/{post_id}", response_model=PostOut)
 async def update_post(post_id: UUID, payload: PostUpdate):
     data = payload.model_dump(exclude_unset=True)
-    res = await db.post.update_one({"id": post_id}, {"$set": data})
-    if res.matched_count == 0:
+    if not data:
+        return await read_post(post_id)
+    doc = await db.post.find_one_and_update(
+        {"id": post_id},
+        {"$set": encode({**data, "updated_at": datetime.utcnow()})},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not doc:
         raise HTTPException(404, "Post not found")
-    return await read_post(post_id)
+    return PostOut(**doc)
 
 @router.delete("/{post_id}")
 async def delete_post(post_id: UUID):
     res = await db.post.delete_one({"id": post_id})
     if res.deleted_count == 0:
         raise HTTPException(404, "Post not found")
+    await record_deleted("post", [post_id])
     return {"detail": "Deleted"}
 
 @router.post("/{post_id}/like", response_model=PostOut)
 async def like_post(post_id: UUID, user_id: UUID):
-    # проверим, существует ли пост
-    post = await db.post.find_one({"id": post_id})
-    if not post:
-        raise HTTPException(404, "Post not found")
-
-    # проверим, лайкал ли уже этот пользователь
-    if user_id in post.get("ids_liked", []):
-        raise HTTPException(400, "You already liked this post")
-
-    # добавляем лайк и user_id в список
-    res = await db.post.update_one(
-        {"id": post_id},
+    # добавляем лайк и user_id в список, если пользователь ещё не лайкал
+    doc = await db.post.find_one_and_update(
+        {"id": post_id, "ids_liked": {"$ne": user_id}},
         {
             "$inc": {"likes": 1},
-            "$push": {"ids_liked": user_id}
-        }
+            "$push": {"ids_liked": user_id},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
+    if doc:
+        return PostOut(**doc)
 
-    if res.matched_count == 0:
+    # не обновили — либо поста нет, либо лайк уже стоит
+    if not await db.post.find_one({"id": post_id}, {"_id": 1}):
         raise HTTPException(404, "Post not found")
-
-    return await read_post(post_id)
+    raise HTTPException(400, "You already liked this post")
 
 @router.get("/search/", response_model=List[PostOut])
 async def search_posts(part: str = Query(..., min_length=1)):
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
-from uuid import UUID, uuid4
+from uuid import UUID
 from datetime import datetime
+from pymongo import ReturnDocument
 from ..schemas import ReviewOut, ReviewCreate, ReviewInDB, ReviewUpdate
 from ..utils.auth import get_current_user
 from ..db import db
+from ..utils.singleflight import coalesce
+from ..utils.ids import new_id
+from ..utils.codec import encode
+from ..utils.tombstones import record_deleted
 from ..schemas import UserOut
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
@@ -11,9 +16,10 @@ router = APIRouter(prefix="/reviews", tags=["reviews"])
 @router.post("/", response_model=ReviewOut)
 async def create_review(payload: ReviewCreate, current_user: UserOut = Depends(get_current_user)):
     data = payload.model_dump()
-    data.update({"id": uuid4(), "reviewer_id": current_user.id, "reviewer_name": current_user.fullname,
+    data.update({"id": new_id(), "reviewer_id": current_user.id, "reviewer_name": current_user.fullname,
                  "timestamp": datetime.utcnow()})
-    await db.review.insert_one(data)
+    data["updated_at"] = data["timestamp"]
+    await db.review.insert_one(encode(data))
     return ReviewOut(**data)
 
 @router.get("/", response_model=list[ReviewOut])
@@ -22,6 +28,7 @@ async def list_reviews():
     return [ReviewOut(**doc) async for doc in docs]
 
 @router.get("/{review_id}", response_model=ReviewOut)
+@coalesce
 async def read_review(review_id: UUID):
     doc = await db.review.find_one({"id": review_id}, {"_id":0})
     if not doc:
@@ -34,6 +41,7 @@ async def list_user_reviews(user_id: UUID):
     return [ReviewOut(**doc) async for doc in docs]
 
 @router.get("/company/{company_id}", response_model=list[ReviewOut])
+@coalesce
 async def list_product_reviews(company_id: UUID):
     docs = db.review.find({"company_id": company_id}, {"_id":0}).sort("timestamp", -1)
     return [ReviewOut(**doc) async for doc in docs]
@@ -42,14 +50,22 @@ async def list_product_reviews(company_id: UUID):
 @router.put("/{review_id}", response_model=ReviewOut)
 async def update_review(review_id: UUID, payload: ReviewUpdate):
     data = payload.model_dump(exclude_unset=True)
-    res = await db.review.update_one({"id": review_id}, {"$set": data})
-    if res.matched_count == 0:
+    if not data:
+        return await read_review(review_id)
+    doc = await db.review.find_one_and_update(
+        {"id": review_id},
+        {"$set": encode({**data, "updated_at": datetime.utcnow()})},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not doc:
         raise HTTPException(404, "Review not found")
-    return await read_review(review_id)
+    return ReviewOut(**doc)
 
 @router.delete("/{review_id}")
 async def delete_review(review_id: UUID):
     res = await db.review.delete_one({"id": review_id})
     if res.deleted_count == 0:
         raise HTTPException(404, "Review not found")
+    await record_deleted("review", [review_id])
     return {"detail": "Deleted"}
\ No newline at end of file
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+
+from ..schemas import SyncOut, UserInDB
+from ..utils.auth import get_current_user
+from ..utils.codec import to_datetime
+from ..utils.message_store import message_store
+from ..utils.sync import changed_since
+from ..settings import settings
+from ..db import db
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.get("/", response_model=SyncOut)
+async def sync(since: datetime, user: UserInDB = Depends(get_current_user)):
+    now = datetime.utcnow()
+    since = to_datetime(since)
+    if since < now - timedelta(days=settings.tombstone_ttl_days):
+        # отметки об удалениях старше этого уже стёрты — нужна полная загрузка
+        raise HTTPException(410, "Watermark is too old, do a full resync")
+
+    limit = settings.sync_page_size
+    room_ids = await db.message_rooms.distinct("id", {"participants": user.id})
+
+    sections = await asyncio.gather(
+        changed_since(db.message_rooms, {"participants": user.id}, "updated_at", since, limit),
+        message_store.changed_since(room_ids, since, limit),
+        changed_since(db.post, {}, "updated_at", since, limit),
+        changed_since(db.review, {}, "updated_at", since, limit),
+        changed_since(db.tombstones, {"$or": [
+            {"kind": {"$in": ["room", "post", "review"]}},
+            {"kind": "message", "room_id": {"$in": room_ids}},
+        ]}, "deleted_at", since, limit),
+    )
+
+    # Без обрезки отдаём всё до now; окно sync_overlap_seconds пересылаем
+    # повторно, чтобы не потерять записи, которые завершились позже своего
+    # updated_at. Если какая-то секция обрезана — продолжаем с её границы.
+    edges = [edge for _, edge in sections if edge]
+    watermark = min(edges + [now - timedelta(seconds=settings.sync_overlap_seconds)])
+    rooms, messages, posts, reviews, deleted = (docs for docs, _ in sections)
+
+    return SyncOut(
+        watermark=max(watermark, since),
+        has_more=bool(edges),
+        rooms=rooms,
+        messages=messages,
+        posts=posts,
+        reviews=reviews,
+        deleted=deleted,
+    )
@@ -0,0 +1,35 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
+from uuid import UUID
+
+from ..utils.auth import get_admin_user
+from ..utils.tasks import queue_stats
+from ..db import db
+
+router = APIRouter(prefix="/tasks", tags=["tasks"], dependencies=[Depends(get_admin_user)])
+
+@router.get("/")
+async def read_queue(status: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    stats = await queue_stats()
+    query = {"status": status} if status else {}
+    cursor = db.tasks.find(query, {"_id": 0}).sort("updated_at", -1).limit(limit)
+    stats["tasks"] = [doc async for doc in cursor]
+    return stats
+
+@router.get("/{task_id}")
+async def read_task(task_id: UUID):
+    doc = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(404, "Task not found")
+    return doc
+
+@router.post("/{task_id}/retry")
+async def retry_task(task_id: UUID):
+    res = await db.tasks.update_one(
+        {"id": task_id, "status": "failed"},
+        {"$set": {"status": "pending", "attempts": 0, "run_at": datetime.utcnow()}}
+    )
+    if res.matched_count == 0:
+        raise HTTPException(404, "Failed task not found")
+    return {"detail": "Requeued"}
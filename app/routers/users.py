@@ -1,12 +1,21 @@
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
-from uuid import UUID, uuid4
+from uuid import UUID
 from fastapi.security import OAuth2PasswordRequestForm
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from ..schemas import UserOut, UserInDB, UserUpdate
+from ..schemas import UserOut, UserInDB, UserUpdate, UserSuggestion
 from ..utils.auth import hash_password, get_current_user, verify_password, get_user_by_NationalID
 from ..db import db
+from ..utils.cleanup import enqueue_cleanup
+from ..utils.tasks import task, enqueue
+from ..utils.autocomplete import user_names
+from ..utils.singleflight import coalesce
+from ..utils.ids import new_id
+from ..utils.codec import encode
+from ..utils.tombstones import record_deleted
 
 
 router = APIRouter(prefix="/users", tags=["users"], dependencies=[Depends(get_current_user)])
@@ -32,12 +41,8 @@ async def create_user(
     experience: Optional[str] = None,
     motivation: Optional[str] = None
 ):
-    existing_user = await db.users.find_one({"NationalID": NationalID})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="User with this National ID already exists")
-
     user_data = {
-        "id": str(uuid4()),
+        "id": new_id(),
         "fullname": fullname,
         "NationalID": NationalID,
         "position": position,
@@ -46,10 +51,15 @@ async def create_user(
         "experience": experience,
         "motivation": motivation,
         "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
         "avatar": None  # Default avatar can be set later
     }
 
-    await db.users.insert_one(user_data)
+    try:
+        await db.users.insert_one(encode(user_data))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="User with this National ID already exists")
+    user_names.add(user_data["id"], fullname)
     return UserOut(**user_data)
 
 @router.get("/", response_model=list[UserOut])
@@ -57,7 +67,12 @@ async def list_users():
     docs = db.users.find({}, {"_id":0, "password":0})
     return [UserOut(**doc) async for doc in docs]
 
+@router.get("/autocomplete", response_model=list[UserSuggestion])
+async def autocomplete_users(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    return [UserSuggestion(id=id, fullname=name) for id, name in user_names.search(q, limit)]
+
 @router.get("/{user_id}", response_model=UserOut)
+@coalesce
 async def read_user(user_id: UUID):
     doc = await db.users.find_one({"id": user_id}, {"_id":0, "password":0})
     if not doc:
@@ -72,6 +87,7 @@ async def read_user_by_name(name: str):
     return UserOut(**doc)
 
 @router.get("/company/{company_id}", response_model=list[UserOut])
+@coalesce
 async def list_users_by_company(company_id: UUID):
     cursor = db.users.find({"company_id": company_id}, {"_id": 0, "password": 0})
     return [UserOut(**doc) async for doc in cursor]
@@ -90,14 +106,45 @@ async def update_user(user_id: UUID, payload: UserUpdate):
     data = payload.model_dump(exclude_unset=True)
     if "password" in data:
         data["password"] = hash_password(data["password"])
-    res = await db.users.update_one({"id": user_id}, {"$set": data})
-    if res.matched_count == 0:
+    if not data:
+        return await read_user(user_id)
+    doc = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$set": encode({**data, "updated_at": datetime.utcnow()})},
+        projection={"_id": 0, "password": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not doc:
         raise HTTPException(404, "User not found")
-    return await read_user(user_id)
+    if "fullname" in data:
+        user_names.add(user_id, data["fullname"])
+        await enqueue("user.rename", {"user_id": user_id})
+    return UserOut(**doc)
+
+@task("user.rename")
+async def propagate_user_name(user_id: UUID, fullname: str | None = None):
+    # имя автора продублировано в постах и отзывах; текущее имя читаем из базы
+    # (fullname — от задач, поставленных до этого)
+    user = await db.users.find_one({"id": user_id}, {"fullname": 1})
+    if not user:
+        return
+    fullname, now = user["fullname"], datetime.utcnow()
+    await db.post.update_many(
+        {"sender_id": user_id, "sender_name": {"$ne": fullname}},
+        {"$set": {"sender_name": fullname, "updated_at": now}}
+    )
+    await db.review.update_many(
+        {"reviewer_id": user_id, "reviewer_name": {"$ne": fullname}},
+        {"$set": {"reviewer_name": fullname, "updated_at": now}}
+    )
 
 @router.delete("/{user_id}")
 async def delete_user(user_id: UUID):
-    res = await db.users.delete_one({"id": user_id})
-    if res.deleted_count == 0:
+    doc = await db.users.find_one_and_delete({"id": user_id}, {"avatar": 1})
+    if not doc:
         raise HTTPException(404, "User not found")
-    return {"detail": "Deleted"}
\ No newline at end of file
+    user_names.remove(user_id)
+    await record_deleted("user", [user_id])
+    # посты, отзывы и участие в чатах удаляются в фоне
+    job_id = await enqueue_cleanup("user", user_id, [doc.get("avatar")])
+    return {"detail": "Deleted", "cleanup_job_id": job_id}
\ No newline at end of file
@@ -57,6 +57,18 @@ class CompanyInDB(CompanyBase):
 class CompanyOut(CompanyInDB):
     pass
 
+class CompanySuggestion(BaseModel):
+    id: UUID
+    name: str
+
+class FacetValue(BaseModel):
+    value: Optional[str]
+    count: int
+
+class CompanyFacets(BaseModel):
+    total: int
+    facets: dict[str, List[FacetValue]]
+
 # --- User Schemas ---
 class UserBase(BaseModel):
     company_id: UUID
@@ -90,6 +102,10 @@ class UserOut(UserBase):
     id: UUID
     avatar: Optional[str]
 
+class UserSuggestion(BaseModel):
+    id: UUID
+    fullname: str
+
 # --- Post Schemas ---
 class PostBase(BaseModel):
     content: str = Field(..., min_length=1)
@@ -184,3 +200,32 @@ class ReviewInDB(ReviewBase):
 
 class ReviewOut(ReviewInDB):
     pass
+
+# --- Dashboard Schemas ---
+class CompanyDashboard(BaseModel):
+    company: CompanyOut
+    employees_total: int
+    employees: List[UserOut]
+    posts: List[PostOut]
+    reviews_total: int
+    rating: Optional[float]
+    reviews: List[ReviewOut]
+
+# --- Sync Schemas ---
+class SyncMessage(MessageOut):
+    room_id: UUID
+
+class Tombstone(BaseModel):
+    kind: str
+    id: UUID
+    room_id: Optional[UUID] = None
+    deleted_at: datetime
+
+class SyncOut(BaseModel):
+    watermark: datetime  # передать как since в следующий запрос
+    has_more: bool
+    rooms: List[MessageRoomOut]
+    messages: List[SyncMessage]
+    posts: List[PostOut]
+    reviews: List[ReviewOut]
+    deleted: List[Tombstone]
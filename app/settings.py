@@ -7,6 +7,42 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int = Field(..., gt=0)
 
+    # "documents" — one document per message, "buckets" — messages grouped per room
+    message_storage: str = "documents"
+    message_bucket_size: int = Field(200, gt=0)
+    message_bucket_window_minutes: int = Field(0, ge=0)  # 0 — only size limits a bucket
+
+    # фоновая очистка зависимых данных после удаления компании/пользователя
+    cleanup_batch_size: int = Field(500, gt=0)
+    cleanup_batch_pause: float = Field(0.2, ge=0)  # секунды между пачками
+    cleanup_archive: bool = False  # копировать удаляемое в archive_<collection>
+
+    # фоновая очередь задач (db.tasks)
+    task_workers: int = Field(4, gt=0)
+    task_max_attempts: int = Field(5, gt=0)
+    task_retry_base: float = Field(2.0, gt=0)  # секунды, удваивается с каждой попыткой
+    task_retry_max: float = Field(300.0, gt=0)
+    task_poll_interval: float = Field(1.0, gt=0)
+    task_lease_seconds: int = Field(600, gt=0)  # после этого "running" считается брошенной
+    task_done_ttl_days: int = Field(7, gt=0)
+
+    autocomplete_refresh_seconds: int = Field(300, gt=0)
+
+    facet_cache_seconds: float = Field(30, ge=0)
+    dashboard_cache_seconds: float = Field(10, ge=0)  # 0 — без кэша
+
+    # /sync
+    sync_page_size: int = Field(500, gt=0)
+    sync_overlap_seconds: float = Field(5, ge=0)  # запас на записи, завершившиеся позже своего updated_at
+    tombstone_ttl_days: int = Field(30, gt=0)
+
+    metrics_loop_interval: float = Field(0.5, gt=0)  # период замера задержки event loop
+
+    # NationalID пользователей с доступом к /debug (ADMIN_NATIONAL_IDS='["..."]')
+    admin_national_ids: list[str] = []
+    profile_max_seconds: float = Field(60, gt=0)
+    profile_request_interval: float = Field(0.001, gt=0)  # период сэмпла для X-Profile
+
     class Config:
         env_file = ".env"
 
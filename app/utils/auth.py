@@ -9,15 +9,20 @@ from uuid import UUID
 from ..settings import settings
 from ..schemas import UserInDB, CompanyInDB
 from app.db import db
+from .singleflight import coalesce
+from .codec import to_uuid
+from .metrics import BLOCKING_CALLS, timed
 
 bcrypt_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 def hash_password(password: str) -> str:
-    return bcrypt_ctx.hash(password)
+    with timed(BLOCKING_CALLS, call="bcrypt_hash"):
+        return bcrypt_ctx.hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt_ctx.verify(plain, hashed)
+    with timed(BLOCKING_CALLS, call="bcrypt_verify"):
+        return bcrypt_ctx.verify(plain, hashed)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -25,14 +30,16 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
+@coalesce
 async def get_user_by_NationalID(NationalID: str) -> UserInDB | None:
     data = await db.users.find_one({"NationalID": NationalID})
     if data:
         return UserInDB(**data)
     return None
 
+@coalesce
 async def get_companies(id: UUID) -> CompanyInDB | None:
-    data = await db.company.find_one({"id": str(id)})
+    data = await db.company.find_one({"id": to_uuid(id)})
     if data:
         return CompanyInDB(**data)
     return None
@@ -56,3 +63,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         raise credentials_exception
 
     return user
+
+async def get_admin_user(user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    if user.NationalID not in settings.admin_national_ids:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+def is_admin_token(authorization: str | None) -> bool:
+    # без похода в базу: sub токена и есть NationalID
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        payload = jwt.decode(authorization[7:], settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return False
+    return payload.get("sub") in settings.admin_national_ids
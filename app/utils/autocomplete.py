@@ -0,0 +1,112 @@
+"""
+Индекс префиксов для подсказок по названиям компаний и именам пользователей.
+
+Ключи — отсортированный список (строка, id), поиск — bisect по префиксу.
+Каждое слово имени тоже ключ, поэтому "pet" находит "Ivan Petrov".
+Индекс живёт в памяти процесса: загружается при старте, обновляется из
+обработчиков и периодически сверяется с Mongo.
+"""
+import asyncio
+import logging
+from bisect import bisect_left, insort
+
+from ..db import db
+from ..settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _tokens(name: str) -> set[str]:
+    words = name.lower().split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    def __init__(self, items=()):
+        self._changes = None
+        self.reset(items)
+
+    def begin_reload(self):
+        # пока читаем коллекцию, обработчики продолжают вызывать add/remove —
+        # запоминаем последнее изменение по каждому id и накатываем его после reset
+        self._changes = {}
+
+    def end_reload(self):
+        self._changes = None
+
+    def reset(self, items):
+        names = {str(id): name for id, name in items}
+        keys = sorted((t, id) for id, name in names.items() for t in _tokens(name))
+        self._names, self._keys = names, keys
+        changes, self._changes = self._changes, None
+        for id, name in (changes or {}).items():
+            if name is None:
+                self.remove(id)
+            else:
+                self.add(id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, id, name: str):
+        self.remove(id)
+        id = str(id)
+        self._names[id] = name
+        for t in _tokens(name):
+            insort(self._keys, (t, id))
+        if self._changes is not None:
+            self._changes[id] = name
+
+    def remove(self, id):
+        id = str(id)
+        if self._changes is not None:
+            self._changes[id] = None
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        for t in _tokens(name):
+            i = bisect_left(self._keys, (t, id))
+            if i < len(self._keys) and self._keys[i] == (t, id):
+                del self._keys[i]
+
+    def search(self, prefix: str, limit: int = 10) -> list[tuple[str, str]]:
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        found: dict[str, str] = {}
+        i = bisect_left(self._keys, (prefix,))
+        while i < len(self._keys) and len(found) < limit:
+            key, id = self._keys[i]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(id, self._names[id])
+            i += 1
+        return list(found.items())
+
+
+company_names = PrefixIndex()
+user_names = PrefixIndex()
+
+
+async def load_indexes():
+    indexes = (company_names, user_names)
+    for index in indexes:
+        index.begin_reload()
+    try:
+        companies = await db.company.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        users = await db.users.find({}, {"_id": 0, "id": 1, "fullname": 1}).to_list(None)
+    except BaseException:
+        for index in indexes:
+            index.end_reload()
+        raise
+    company_names.reset((c["id"], c["name"]) for c in companies if c.get("name"))
+    user_names.reset((u["id"], u["fullname"]) for u in users if u.get("fullname"))
+
+
+async def reconcile_indexes():
+    while True:
+        await asyncio.sleep(settings.autocomplete_refresh_seconds)
+        try:
+            await load_indexes()
+        except Exception:
+            logger.exception("Could not refresh autocomplete indexes")
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+from uuid import UUID
+
+from pymongo import ReplaceOne
+
+from ..db import db
+from ..settings import settings
+from .helpers import remove_img
+from .tasks import task, enqueue
+from .ids import new_id
+from .codec import encode, to_uuid
+from .tombstones import record_deleted
+from .autocomplete import user_names
+
+# коллекция -> вид отметки об удалении для /sync
+# (сообщения удаляются только вместе с комнатой — хватает отметки комнаты)
+TOMBSTONE_KINDS = {"post": "post", "review": "review", "users": "user", "message_rooms": "room"}
+
+
+async def _progress(job_id: UUID, **inc):
+    await db.cleanup_jobs.update_one(
+        {"id": job_id},
+        {"$inc": {f"progress.{k}": v for k, v in inc.items()}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+
+
+def _media(doc: dict, field: str) -> list:
+    # field может вести внутрь массива: "messages.image" в бакете сообщений
+    head, _, rest = field.partition(".")
+    value = doc.get(head)
+    if not rest:
+        return [value]
+    if isinstance(value, list):
+        return [p for v in value if isinstance(v, dict) for p in _media(v, rest)]
+    return _media(value, rest) if isinstance(value, dict) else []
+
+
+async def _remove_files(paths):
+    paths = [p for p in paths if p]
+    if paths:
+        await asyncio.to_thread(lambda: [remove_img(p) for p in paths])
+
+
+async def _delete_batches(collection: str, query: dict, job_id: UUID, media_field: str | None = None, on_batch=None):
+    """Удаляет документы пачками, отмечая прогресс и делая паузу между пачками."""
+    coll = db[collection]
+    size = settings.cleanup_batch_size
+    projection = None
+    if not settings.cleanup_archive:
+        projection = {"_id": 1, "id": 1}
+        if media_field:
+            projection[media_field] = 1
+    while True:
+        docs = await coll.find(query, projection).limit(size).to_list(size)
+        if not docs:
+            return
+        if on_batch:
+            await on_batch(docs)
+        if settings.cleanup_archive:
+            # upsert по _id: повтор после сбоя между архивом и удалением не падает на E11000
+            await db[f"archive_{collection}"].bulk_write(
+                [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False
+            )
+        await coll.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        if collection in TOMBSTONE_KINDS:
+            await record_deleted(TOMBSTONE_KINDS[collection], [d["id"] for d in docs])
+        if media_field:
+            await _remove_files(p for d in docs for p in _media(d, media_field))
+        await _progress(job_id, **{collection: len(docs)})
+        await asyncio.sleep(settings.cleanup_batch_pause)
+
+
+async def _drop_rooms(job_id: UUID):
+    # комнаты, где не осталось участников, удаляем вместе с сообщениями
+    rooms = await db.message_rooms.find({"participants": {"$size": 0}}, {"id": 1}).to_list(None)
+    for room in rooms:
+        await _delete_batches("message", {"room_id": room["id"]}, job_id, media_field="image")
+        await _delete_batches("message_buckets", {"room_id": room["id"]}, job_id, media_field="messages.image")
+    await _delete_batches("message_rooms", {"participants": {"$size": 0}}, job_id)
+
+
+async def _detach_users(user_ids: list, job_id: UUID):
+    ids = [to_uuid(i) for i in user_ids]
+    await _delete_batches("post", {"sender_id": {"$in": ids}}, job_id, media_field="image")
+    await _delete_batches("review", {"reviewer_id": {"$in": ids}}, job_id)
+    res = await db.message_rooms.update_many(
+        {"participants": {"$in": ids}},
+        {"$pull": {"participants": {"$in": ids}}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    await _progress(job_id, room_memberships=res.modified_count)
+
+
+async def cleanup_user(job_id: UUID, user_id: UUID):
+    await _detach_users([user_id], job_id)
+    await _drop_rooms(job_id)
+
+
+async def cleanup_company(job_id: UUID, company_id: UUID):
+    await _delete_batches("post", {"company_id": company_id}, job_id, media_field="image")
+    await _delete_batches("review", {"company_id": company_id}, job_id)
+
+    async def detach(users):
+        await _detach_users([u["id"] for u in users], job_id)
+        for u in users:
+            user_names.remove(u["id"])
+
+    await _delete_batches("users", {"company_id": company_id}, job_id, media_field="avatar", on_batch=detach)
+    await _drop_rooms(job_id)
+
+
+HANDLERS = {
+    "company": cleanup_company,
+    "user": cleanup_user,
+}
+
+
+@task("cleanup")
+async def run_cleanup(job_id: UUID):
+    job = await db.cleanup_jobs.find_one({"id": job_id})
+    if not job or job["status"] == "done":
+        return
+    await db.cleanup_jobs.update_one({"id": job_id}, {"$set": {"status": "running"}})
+    try:
+        await _remove_files(job.get("media", []))
+        await HANDLERS[job["kind"]](job_id, job["target_id"])
+    except Exception as e:
+        # повтор сделает очередь задач — все шаги идемпотентны
+        await db.cleanup_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "failed", "error": repr(e), "updated_at": datetime.utcnow()}}
+        )
+        raise
+    await db.cleanup_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+    )
+
+
+async def enqueue_cleanup(kind: str, target_id: UUID, media: list[str | None] = ()) -> UUID:
+    now = datetime.utcnow()
+    job = {
+        "id": new_id(),
+        "kind": kind,
+        "target_id": target_id,
+        "media": [m for m in media if m],
+        "status": "pending",
+        "progress": {},
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db.cleanup_jobs.insert_one(encode(job))
+    await enqueue("cleanup", {"job_id": job["id"]})
+    return job["id"]
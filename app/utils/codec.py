@@ -0,0 +1,56 @@
+"""
+Единый формат хранения: id — бинарные UUID (subtype 4), даты — BSON datetime (UTC).
+
+Все записи в базу проходят через `encode`, поэтому строковые id и ISO-строки
+дат больше не попадают в коллекции и поиск по `id` всегда попадает в индекс.
+"""
+from datetime import datetime, timezone
+from uuid import UUID
+
+from bson.binary import Binary, UuidRepresentation
+
+UUID_FIELDS = {
+    "id", "company_id", "sender_id", "reviewer_id", "room_id",
+    "participants", "ids_liked", "target_id", "user_id", "job_id",
+}
+DATETIME_FIELDS = {
+    "created_at", "updated_at", "timestamp", "start", "end", "window",
+    "run_at", "locked_at", "finished_at",
+}
+
+
+def to_uuid(value) -> UUID:
+    if isinstance(value, UUID):
+        return value
+    if isinstance(value, Binary):
+        # subtype 3 остался от старых драйверов
+        rep = UuidRepresentation.STANDARD if value.subtype == 4 else UuidRepresentation.PYTHON_LEGACY
+        return value.as_uuid(rep)
+    return UUID(str(value))
+
+
+def to_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_value(key, value):
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return encode(value)
+    if isinstance(value, list):
+        return [_encode_value(key, v) for v in value]
+    if key in UUID_FIELDS:
+        return to_uuid(value)
+    if key in DATETIME_FIELDS:
+        return to_datetime(value)
+    return value
+
+
+def encode(doc: dict) -> dict:
+    """Приводит id и даты документа (и вложенных документов) к каноническому виду."""
+    return {k: _encode_value(k, v) for k, v in doc.items()}
@@ -1,28 +1,47 @@
 from fastapi import UploadFile
 from uuid import uuid4, UUID
+import asyncio
 import os
 import shutil
 
 from ..db import db
+from .singleflight import coalesce
+from .codec import to_uuid
+from .metrics import BLOCKING_CALLS, timed
 
 def save_img(type: str, img: UploadFile) -> str:
     save_dir = f"static/{type}s"
     os.makedirs(save_dir, exist_ok=True)
     fn = f"{uuid4().hex}_{img.filename}"
     path = os.path.join(save_dir, fn)
-    with open(path, "wb") as buf:
+    with timed(BLOCKING_CALLS, call="save_img"), open(path, "wb") as buf:
         shutil.copyfileobj(img.file, buf)
 
     return f"/{save_dir}/{fn}"
 
+async def store_img(type: str, img: UploadFile | None) -> str | None:
+    # запись файла блокирует — выполняем её в потоке, не в event loop
+    if not img:
+        return None
+    return await asyncio.to_thread(save_img, type, img)
+
+def remove_img(path: str | None) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path.lstrip("/"))
+    except FileNotFoundError:
+        pass
+
 async def find_username(id: str) -> str:
-    doc = await db.users.find_one({"id": id})
+    doc = await db.users.find_one({"id": to_uuid(id)})
     if not doc:
         return "Unknown"
     return doc.get("name", "Unknown")
 
+@coalesce
 async def get_company_name(id: UUID) -> str:
-    doc = await db.company.find_one({"id": str(id)})
+    doc = await db.company.find_one({"id": to_uuid(id)})
     if not doc:
         return "Unknown"
     return doc['name'] if 'name' in doc else "Unknown"
\ No newline at end of file
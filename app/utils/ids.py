@@ -0,0 +1,54 @@
+"""
+Идентификаторы документов — UUIDv7 (RFC 9562).
+
+Первые 48 бит — миллисекунды Unix-времени, поэтому новые id идут по
+возрастанию: вставки дописываются в конец индекса, а сами id сортируются
+хронологически и годятся как ключ пагинации. Внутри одной миллисекунды
+порядок держит 12-битный счётчик.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+EPOCH = datetime(1970, 1, 1)
+
+_lock = threading.Lock()
+_last_ms = 0
+_seq = 0
+
+
+def new_id() -> UUID:
+    global _last_ms, _seq
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            # случайный старт счётчика, с запасом для следующих id в той же мс
+            _seq = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # та же миллисекунда или часы ушли назад — продолжаем от последнего id
+            ms = _last_ms
+            _seq += 1
+            if _seq > 0xFFF:
+                ms += 1
+                _seq = 0
+        _last_ms = ms
+        seq = _seq
+
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return UUID(int=(ms << 80) | (0x7 << 76) | (seq << 64) | (0b10 << 62) | rand)
+
+
+def id_timestamp(id: UUID | str) -> datetime:
+    """Время создания (UTC, без tzinfo — как datetime.utcnow()) из UUIDv7."""
+    id = UUID(str(id))
+    if id.version != 7:
+        raise ValueError(f"{id} is not a UUIDv7")
+    return EPOCH + timedelta(milliseconds=id.int >> 80)
+
+
+def first_id_at(ts: datetime) -> UUID:
+    """Наименьший UUIDv7 для момента `ts` — граница для запросов по диапазону id."""
+    ms = int((ts - EPOCH) / timedelta(milliseconds=1))
+    return UUID(int=(ms << 80) | (0x7 << 76) | (0b10 << 62))
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+from typing import List
+from uuid import UUID
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..db import db
+from ..settings import settings
+from .codec import encode
+from .sync import changed_since
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def window_start(ts: datetime, minutes: int) -> datetime | None:
+    if not minutes:
+        return None
+    step = minutes * 60
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % step)
+
+
+class DocumentMessageStore:
+    """Каждое сообщение — отдельный документ в db.message."""
+
+    async def append(self, room_id: UUID, message: dict) -> None:
+        await db.message.insert_one(encode({**message, "room_id": room_id}))
+
+    async def list(self, room_id: UUID, before: datetime | None = None, limit: int | None = None) -> list[dict]:
+        query = {"room_id": room_id}
+        if before:
+            query["timestamp"] = {"$lt": before}
+        cursor = db.message.find(query, {"_id": 0}).sort("timestamp", -1)
+        if limit:
+            cursor = cursor.limit(limit)
+        docs = [doc async for doc in cursor]
+        docs.reverse()
+        return docs
+
+    async def last(self, room_id: UUID) -> dict | None:
+        return await db.message.find_one(
+            {"room_id": room_id},
+            sort=[("timestamp", -1)],
+            projection={"_id": 0}
+        )
+
+    async def get(self, room_id: UUID, message_id: UUID) -> dict | None:
+        return await db.message.find_one({"id": message_id, "room_id": room_id}, {"_id": 0})
+
+    async def update(self, room_id: UUID, message_id: UUID, data: dict) -> dict | None:
+        return await db.message.find_one_and_update(
+            {"id": message_id, "room_id": room_id},
+            {"$set": encode({**data, "updated_at": datetime.utcnow()})},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def delete(self, room_id: UUID, message_id: UUID) -> bool:
+        res = await db.message.delete_one({"id": message_id, "room_id": room_id})
+        return res.deleted_count > 0
+
+    async def changed_since(self, room_ids: List, since: datetime, limit: int) -> tuple[List[dict], datetime | None]:
+        return await changed_since(db.message, {"room_id": {"$in": room_ids}}, "updated_at", since, limit)
+
+
+class BucketMessageStore:
+    """
+    Сообщения комнаты хранятся пачками в db.message_buckets:
+    {room_id, window, count, start, end, messages: [...]}.
+    Бакет закрывается, когда в нём `size` сообщений или (если задано)
+    закончилось временное окно `window_minutes`.
+    """
+
+    def __init__(self, size: int, window_minutes: int = 0):
+        self.size = size
+        self.window_minutes = window_minutes
+
+    async def append(self, room_id: UUID, message: dict) -> None:
+        message = encode(message)
+        ts = message["timestamp"]
+        window = window_start(ts, self.window_minutes)
+        # в комнате (и окне) открыт не больше одного бакета — это держит
+        # уникальный частичный индекс по {open: true}
+        while True:
+            bucket = await db.message_buckets.find_one_and_update(
+                {"room_id": room_id, "window": window, "open": True},
+                {
+                    "$push": {"messages": message},
+                    "$inc": {"count": 1},
+                    "$min": {"start": ts},
+                    "$max": {"end": ts, "updated_at": message.get("updated_at", ts)},
+                },
+                projection={"count": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if bucket:
+                # count считает занятые слоты и не уменьшается при удалении;
+                # параллельные вставки могут переполнить бакет на пару сообщений
+                if bucket["count"] >= self.size:
+                    await db.message_buckets.update_one({"_id": bucket["_id"], "open": True}, {"$unset": {"open": ""}})
+                return
+            bucket = {
+                "room_id": room_id,
+                "window": window,
+                "count": 1,
+                "start": ts,
+                "end": ts,
+                "updated_at": message.get("updated_at", ts),
+                "messages": [message],
+            }
+            if self.size > 1:
+                bucket["open"] = True
+            try:
+                await db.message_buckets.insert_one(bucket)
+                return
+            except DuplicateKeyError:
+                continue  # бакет только что открыл другой запрос
+
+    async def list(self, room_id: UUID, before: datetime | None = None, limit: int | None = None) -> list[dict]:
+        query = {"room_id": room_id}
+        if before:
+            query["start"] = {"$lt": before}
+        cursor = db.message_buckets.find(query, {"_id": 0, "end": 1, "messages": 1}).sort("end", -1)
+        if limit:
+            # обычно хватает одного-двух бакетов
+            cursor = cursor.batch_size(2)
+
+        messages = []
+        async for bucket in cursor:
+            # диапазоны соседних бакетов могут пересекаться (сообщение с более
+            # ранним timestamp дописано позже), поэтому останавливаемся, только
+            # когда следующий бакет целиком старше уже набранных limit сообщений
+            if limit and len(messages) >= limit and bucket["end"] < messages[-limit]["timestamp"]:
+                break
+            messages += [m for m in bucket["messages"] if before is None or m["timestamp"] < before]
+            messages.sort(key=lambda m: m["timestamp"])
+        return messages[-limit:] if limit else messages
+
+    async def last(self, room_id: UUID) -> dict | None:
+        messages = await self.list(room_id, limit=1)
+        return messages[0] if messages else None
+
+    async def get(self, room_id: UUID, message_id: UUID) -> dict | None:
+        bucket = await db.message_buckets.find_one(
+            {"room_id": room_id, "messages.id": message_id},
+            {"_id": 0, "messages": {"$elemMatch": {"id": message_id}}}
+        )
+        return bucket["messages"][0] if bucket else None
+
+    async def update(self, room_id: UUID, message_id: UUID, data: dict) -> dict | None:
+        now = datetime.utcnow()
+        bucket = await db.message_buckets.find_one_and_update(
+            {"room_id": room_id, "messages.id": message_id},
+            {
+                "$set": {f"messages.$.{k}": v for k, v in encode({**data, "updated_at": now}).items()},
+                "$max": {"updated_at": now},
+            },
+            projection={"_id": 0, "messages": {"$elemMatch": {"id": message_id}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return bucket["messages"][0] if bucket else None
+
+    async def delete(self, room_id: UUID, message_id: UUID) -> bool:
+        res = await db.message_buckets.update_one(
+            {"room_id": room_id, "messages.id": message_id},
+            {"$pull": {"messages": {"id": message_id}}}
+        )
+        return res.modified_count > 0
+
+    async def changed_since(self, room_ids: List, since: datetime, limit: int) -> tuple[List[dict], datetime | None]:
+        cursor = db.message_buckets.find(
+            {"room_id": {"$in": room_ids}, "updated_at": {"$gt": since}},
+            {"_id": 0, "room_id": 1, "messages": 1}
+        )
+        messages = [
+            {**m, "room_id": bucket["room_id"]}
+            async for bucket in cursor
+            for m in bucket["messages"]
+            if m.get("updated_at") and m["updated_at"] > since
+        ]
+        messages.sort(key=lambda m: m["updated_at"])
+        if len(messages) <= limit:
+            return messages, None
+        edge = messages[limit - 1]["updated_at"]
+        return [m for m in messages if m["updated_at"] <= edge], edge
+
+
+def get_message_store():
+    if settings.message_storage == "buckets":
+        return BucketMessageStore(settings.message_bucket_size, settings.message_bucket_window_minutes)
+    return DocumentMessageStore()
+
+
+message_store = get_message_store()
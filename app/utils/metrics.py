@@ -0,0 +1,226 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+    REQUESTS.inc(method="GET", route="/users/{user_id}", status="200")
+    with timed(BLOCKING_CALLS, call="bcrypt_hash"): ...
+
+Значения меняются и из потоков (пул соединений Motor работает в executor),
+поэтому каждая метрика защищена своим локом.
+"""
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: tuple = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счётчики по корзинам (последняя — +Inf), сумма]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        names = self.label_names + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def collector(fn):
+    """Регистрирует корутину, которая обновляет метрики перед каждой выдачей /metrics."""
+    _collectors.append(fn)
+    return fn
+
+
+async def render() -> str:
+    for fn in _collectors:
+        try:
+            await fn()
+        except Exception:
+            logger.exception("Metrics collector %s failed", fn.__name__)
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being processed")
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of event loop wake-ups",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+BLOCKING_CALLS = Histogram("blocking_call_duration_seconds", "Blocking calls made on the event loop", ("call",))
+POOL_CONNECTIONS = Gauge("mongo_pool_connections", "Open connections in the Mongo pool", ("address",))
+POOL_CHECKED_OUT = Gauge("mongo_pool_checked_out", "Mongo connections in use", ("address",))
+POOL_WAIT = Histogram("mongo_pool_checkout_seconds", "Time spent waiting for a Mongo connection")
+POOL_FAILURES = Counter("mongo_pool_checkout_failures_total", "Failed Mongo connection checkouts", ("reason",))
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка, статус и число запросов в работе по шаблону маршрута."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # маршрут известен только после роутинга — FastAPI кладёт его в scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route)
+            REQUESTS.inc(method=scope["method"], route=route, status=status)
+
+
+async def sample_loop_lag(interval: float):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(time.perf_counter() - start - interval, 0))
+
+
+class PoolListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._checkout_started = threading.local()
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(address=f"{event.address[0]}:{event.address[1]}")
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(address=f"{event.address[0]}:{event.address[1]}")
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        POOL_FAILURES.inc(reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        started = getattr(self._checkout_started, "value", None)
+        if started is not None:
+            POOL_WAIT.observe(time.perf_counter() - started)
+        POOL_CHECKED_OUT.inc(address=f"{event.address[0]}:{event.address[1]}")
+
+    def connection_checked_in(self, event):
+        POOL_CHECKED_OUT.dec(address=f"{event.address[0]}:{event.address[1]}")
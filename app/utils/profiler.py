@@ -0,0 +1,166 @@
+"""
+Сэмплирующий профайлер для живого процесса.
+
+Отдельный поток раз в interval снимает стек потока event loop через
+sys._current_frames() и считает одинаковые стеки. Код приложения не
+инструментируется, поэтому накладные расходы — только на сам сэмпл.
+
+    profiler = SamplingProfiler(interval=0.005)
+    profiler.start()
+    await asyncio.sleep(10)
+    profiler.stop()
+    profiler.collapsed()   # "a;b;c 42" — для flamegraph.pl / speedscope
+    profiler.speedscope()  # JSON для https://www.speedscope.app
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from .ids import new_id
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+KEEP_PROFILES = 20  # сколько последних профилей запросов держим в памяти
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def _frame_name(key) -> str:
+    name, filename, line = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, all_threads: bool = False, name: str = "profile"):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.name = name
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        # по умолчанию — поток, из которого запущен профайлер, т.е. event loop
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.all_threads:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident != own:
+                        self._sample(frame, names.get(ident, str(ident)))
+            elif self._target in frames:
+                self._sample(frames[self._target])
+            self.samples += 1
+
+    def _sample(self, frame, thread: str | None = None):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_key(frame))
+            frame = frame.f_back
+        stack.reverse()
+        if thread is not None:
+            stack.insert(0, (f"thread {thread}", "", 0))
+        self.stacks[tuple(stack)] += 1
+
+    def collapsed(self) -> str:
+        lines = [
+            ";".join(_frame_name(f) if f[1] else f[0] for f in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    name, filename, line = key
+                    frames.append({"name": name, "file": filename, "line": line} if filename else {"name": name})
+                ids.append(index[key])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "enterra-api",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+# профили отдельных запросов (X-Profile: 1), последние KEEP_PROFILES штук
+recent_profiles: "OrderedDict[str, SamplingProfiler]" = OrderedDict()
+
+
+def _remember(profile_id: str, profiler: SamplingProfiler):
+    recent_profiles[profile_id] = profiler
+    while len(recent_profiles) > KEEP_PROFILES:
+        recent_profiles.popitem(last=False)
+
+
+class ProfilerMiddleware:
+    """
+    Профилирует один запрос, если админ прислал заголовок X-Profile.
+    Результат доступен по GET /debug/profile/{id}, id — в заголовке X-Profile-Id.
+    Сэмплируется весь event loop, так что в профиль попадут и параллельные запросы.
+    """
+
+    def __init__(self, app, is_admin, interval: float = 0.001):
+        self.app = app
+        self.is_admin = is_admin
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        if headers.get(PROFILE_HEADER, "0") in ("", "0") or not self.is_admin(headers.get("authorization")):
+            return await self.app(scope, receive, send)
+
+        profile_id = str(new_id())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval, name=f"{scope['method']} {scope['path']}")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            _remember(profile_id, profiler)
@@ -0,0 +1,42 @@
+"""
+Склейка одинаковых конкурентных запросов (singleflight).
+
+Пока запрос с ключом выполняется, остальные вызовы с тем же ключом ждут
+его результата вместо похода в базу. Результат не кэшируется: следующий
+вызов после завершения снова идёт в базу.
+"""
+import asyncio
+import functools
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._forget(key, call))
+        # shield — отмена одного ожидающего (клиент ушёл) не отменяет запрос для остальных
+        return await asyncio.shield(call)
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+flights = SingleFlight()
+
+
+def coalesce(fn):
+    """Декоратор: одновременные вызовы `fn` с одинаковыми аргументами делят один запрос."""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        return await flights.do(key, fn, *args, **kwargs)
+
+    return wrapper
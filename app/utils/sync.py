@@ -0,0 +1,18 @@
+from datetime import datetime
+
+
+async def changed_since(coll, query: dict, field: str, since: datetime, limit: int) -> tuple[list[dict], datetime | None]:
+    """
+    Документы, изменённые после `since`, по возрастанию `field`.
+
+    Если их больше `limit`, возвращает ещё и границу: все документы с
+    `field` <= границы уже в ответе (включая изменённые одной пачкой
+    с тем же временем), так что следующий запрос можно начинать с неё.
+    """
+    docs = await coll.find({**query, field: {"$gt": since}}, {"_id": 0}).sort(field, 1).limit(limit).to_list(limit)
+    if len(docs) < limit:
+        return docs, None
+    edge = docs[-1][field]
+    docs = [d for d in docs if d[field] < edge]
+    docs += await coll.find({**query, field: edge}, {"_id": 0}).to_list(None)
+    return docs, edge
@@ -0,0 +1,177 @@
+"""
+Простая очередь фоновых задач поверх Mongo.
+
+Задача — документ в db.tasks, поэтому переживает перезапуск. Воркеры
+(settings.task_workers на процесс) забирают задачи атомарно через
+find_one_and_update, неудачные попытки повторяются с экспоненциальной паузой.
+
+    @task("posts.rename_company")
+    async def rename_company(company_id, name): ...
+
+    await enqueue("posts.rename_company", {"company_id": ..., "name": ...})
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from pymongo import ReturnDocument
+
+from ..db import db
+from ..settings import settings
+from .ids import new_id
+from .codec import encode
+from .metrics import Gauge, collector
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_workers: list[asyncio.Task] = []
+_wakeup = asyncio.Event()
+
+QUEUE_DEPTH = Gauge("task_queue_depth", "Tasks in db.tasks by status", ("status",))
+QUEUE_WORKERS = Gauge("task_queue_workers", "Task workers in this process")
+
+
+def task(name: str):
+    def register(fn):
+        _handlers[name] = fn
+        return fn
+    return register
+
+
+async def enqueue(name: str, payload: dict | None = None, delay: float = 0, max_attempts: int | None = None) -> UUID:
+    if name not in _handlers:
+        raise ValueError(f"Unknown task: {name}")
+    now = datetime.utcnow()
+    doc = {
+        "id": new_id(),
+        "name": name,
+        "payload": payload or {},
+        "status": "pending",
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.task_max_attempts,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+        "updated_at": now,
+        "last_error": None,
+    }
+    await db.tasks.insert_one(encode(doc))
+    _wakeup.set()
+    return doc["id"]
+
+
+def _backoff(attempts: int) -> float:
+    return min(settings.task_retry_base * 2 ** (attempts - 1), settings.task_retry_max)
+
+
+async def _claim() -> dict | None:
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.task_lease_seconds)
+    # задачи, захваченные упавшим процессом, забираем после истечения аренды
+    return await db.tasks.find_one_and_update(
+        {"$or": [
+            {"status": "pending", "run_at": {"$lte": now}},
+            {"status": "running", "locked_at": {"$lt": stale}},
+        ]},
+        # lease — метка этого захвата: продлить аренду и записать итог может только её владелец
+        {"$set": {"status": "running", "locked_at": now, "lease": new_id(), "updated_at": now}, "$inc": {"attempts": 1}},
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _heartbeat(job: dict):
+    # продлеваем аренду, пока обработчик работает, иначе долгую задачу
+    # заберёт второй воркер
+    while True:
+        await asyncio.sleep(settings.task_lease_seconds / 3)
+        now = datetime.utcnow()
+        try:
+            res = await db.tasks.update_one(
+                {"id": job["id"], "lease": job["lease"]},
+                {"$set": {"locked_at": now, "updated_at": now}}
+            )
+        except Exception:
+            logger.exception("Could not renew lease of task %s", job["id"])
+            continue
+        if res.matched_count == 0:
+            logger.warning("Task %s (%s) lost its lease", job["name"], job["id"])
+            return
+
+
+async def _execute(job: dict):
+    beat = asyncio.create_task(_heartbeat(job))
+    try:
+        await _handlers[job["name"]](**job["payload"])
+    except Exception as e:
+        logger.exception("Task %s (%s) failed", job["name"], job["id"])
+        now = datetime.utcnow()
+        update = {"last_error": repr(e), "updated_at": now}
+        if job["attempts"] < job["max_attempts"]:
+            update.update(status="pending", run_at=now + timedelta(seconds=_backoff(job["attempts"])))
+        else:
+            update["status"] = "failed"
+    else:
+        now = datetime.utcnow()
+        update = {"status": "done", "finished_at": now, "updated_at": now}
+    finally:
+        beat.cancel()
+    await _finish(job, update)
+
+
+async def _finish(job: dict, update: dict):
+    # если аренду уже забрал другой воркер, итог пишет он
+    res = await db.tasks.update_one({"id": job["id"], "lease": job["lease"]}, {"$set": update})
+    if res.matched_count == 0:
+        logger.warning("Task %s (%s) lost its lease, result dropped", job["name"], job["id"])
+
+
+async def _worker():
+    while True:
+        try:
+            job = await _claim()
+        except Exception:
+            logger.exception("Could not claim a task")
+            job = None
+
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.task_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _execute(job)
+
+
+async def start_workers():
+    for _ in range(settings.task_workers):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def stop_workers():
+    for w in _workers:
+        w.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def queue_stats() -> dict:
+    counts = {doc["_id"]: doc["count"] async for doc in db.tasks.aggregate(
+        [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    )}
+    return {
+        "workers": len(_workers),
+        "handlers": sorted(_handlers),
+        "counts": counts,
+    }
+
+
+@collector
+async def collect_queue_metrics():
+    counts = (await queue_stats())["counts"]
+    for status in ("pending", "running", "done", "failed"):
+        QUEUE_DEPTH.set(counts.get(status, 0), status=status)
+    QUEUE_WORKERS.set(len(_workers))
@@ -0,0 +1,16 @@
+from datetime import datetime
+from uuid import UUID
+
+from ..db import db
+from .codec import to_uuid
+
+
+async def record_deleted(kind: str, ids, room_id: UUID | None = None):
+    """Оставляет отметку об удалении, чтобы /sync мог сообщить о ней клиентам."""
+    now = datetime.utcnow()
+    docs = [
+        {"kind": kind, "id": to_uuid(i), "room_id": room_id, "deleted_at": now}
+        for i in ids
+    ]
+    if docs:
+        await db.tombstones.insert_many(docs)